@@ -1,22 +1,48 @@
 """Dynamics Theme - Automatic Windows theme switcher based on sunrise/sunset times."""
 
-from typing import Optional, Tuple, Any
-from datetime import datetime, timezone
+from typing import Optional, Tuple, Any, Mapping
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache, partial
+from types import MappingProxyType
 import ctypes
+from ctypes import wintypes
+import io
+import json
+import logging
+import math
+import os
 import sys
 import threading
 import time
 
-import ephem
 import pystray
-import requests
 import winreg
 from PIL import Image
 
 APP_NAME = 'Dynamics Theme'
 VERSION = '1.3'
 
-TRANSLATIONS = {
+# Silent by default: a tray app usually has no console. Set LOG_ENV_VAR to a file path to opt in.
+logger = logging.getLogger('dynamics_theme')
+logger.addHandler(logging.NullHandler())
+LOG_ENV_VAR = 'DYNAMICS_THEME_LOG'
+
+LIB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lib')
+CACHE_DIR = os.path.join(os.environ.get('LOCALAPPDATA') or os.path.expanduser('~'), 'DynamicsTheme')
+LOCATION_CACHE_PATH = os.path.join(CACHE_DIR, 'location.json')
+LOCATION_CACHE_TTL = 86400  # seconds (24 hours)
+SUN_TIMES_CACHE_SIZE = 32
+REG_NOTIFY_CHANGE_LAST_SET = 0x00000004
+WAIT_OBJECT_0 = 0x00000000
+INFINITE = 0xFFFFFFFF
+INVALID_HANDLE_VALUE = wintypes.HANDLE(-1).value
+HWND_BROADCAST = 0xFFFF
+WM_SETTINGCHANGE = 0x001A
+SMTO_ABORTIFHUNG = 0x0002
+BROADCAST_TIMEOUT = 100  # milliseconds each window gets to handle the theme change
+MAX_WAIT = 3600  # upper bound on a single wait, so suspend/resume and clock changes are noticed
+
+_RAW_TRANSLATIONS = {
     'en': {
         'dark': 'Dark ☾',
         'light': 'Light ☼',
@@ -79,8 +105,173 @@ TRANSLATIONS = {
     },
 }
 
+# Read-only view of the translations; the table never changes at runtime
+TRANSLATIONS: Mapping[str, Mapping[str, str]] = MappingProxyType({
+    sys.intern(language): MappingProxyType(strings)
+    for language, strings in _RAW_TRANSLATIONS.items()
+})
+
+_kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+_user32 = ctypes.WinDLL('user32', use_last_error=True)
+_advapi32 = ctypes.WinDLL('advapi32', use_last_error=True)
+
+_SendMessageTimeoutW = _user32.SendMessageTimeoutW
+_SendMessageTimeoutW.argtypes = [
+    wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPCWSTR,
+    wintypes.UINT, wintypes.UINT, ctypes.POINTER(ctypes.c_size_t),
+]
+_SendMessageTimeoutW.restype = wintypes.LPARAM
+_GetUserDefaultUILanguage = _kernel32.GetUserDefaultUILanguage
+_GetUserDefaultUILanguage.argtypes = []
+_GetUserDefaultUILanguage.restype = wintypes.LANGID
+_GetLocaleInfoW = _kernel32.GetLocaleInfoW
+_GetLocaleInfoW.argtypes = [wintypes.LCID, wintypes.DWORD, wintypes.LPWSTR, ctypes.c_int]
+_GetLocaleInfoW.restype = ctypes.c_int
+
+_CreateEventW = _kernel32.CreateEventW
+_CreateEventW.argtypes = [ctypes.c_void_p, wintypes.BOOL, wintypes.BOOL, wintypes.LPCWSTR]
+_CreateEventW.restype = wintypes.HANDLE
+_SetEvent = _kernel32.SetEvent
+_SetEvent.argtypes = [wintypes.HANDLE]
+_SetEvent.restype = wintypes.BOOL
+_CloseHandle = _kernel32.CloseHandle
+_CloseHandle.argtypes = [wintypes.HANDLE]
+_CloseHandle.restype = wintypes.BOOL
+_WaitForMultipleObjects = _kernel32.WaitForMultipleObjects
+_WaitForMultipleObjects.argtypes = [wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE), wintypes.BOOL, wintypes.DWORD]
+_WaitForMultipleObjects.restype = wintypes.DWORD
+_RegNotifyChangeKeyValue = _advapi32.RegNotifyChangeKeyValue
+_RegNotifyChangeKeyValue.argtypes = [wintypes.HKEY, wintypes.BOOL, wintypes.DWORD, wintypes.HANDLE, wintypes.BOOL]
+_RegNotifyChangeKeyValue.restype = wintypes.LONG
+
+# Registry transactions are optional; without them the theme values are written through a plain key handle
+try:
+    _ktmw32 = ctypes.WinDLL('ktmw32', use_last_error=True)
+    _CreateTransaction = _ktmw32.CreateTransaction
+    _CreateTransaction.argtypes = [
+        ctypes.c_void_p, ctypes.c_void_p, wintypes.DWORD, wintypes.DWORD,
+        wintypes.DWORD, wintypes.DWORD, wintypes.LPWSTR,
+    ]
+    _CreateTransaction.restype = wintypes.HANDLE
+    _CommitTransaction = _ktmw32.CommitTransaction
+    _CommitTransaction.argtypes = [wintypes.HANDLE]
+    _CommitTransaction.restype = wintypes.BOOL
+    _RegOpenKeyTransactedW = _advapi32.RegOpenKeyTransactedW
+    _RegOpenKeyTransactedW.argtypes = [
+        wintypes.HKEY, wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD,
+        ctypes.POINTER(wintypes.HKEY), wintypes.HANDLE, ctypes.c_void_p,
+    ]
+    _RegOpenKeyTransactedW.restype = wintypes.LONG
+except (OSError, AttributeError):
+    _CreateTransaction = _CommitTransaction = _RegOpenKeyTransactedW = None
+_RegCloseKey = _advapi32.RegCloseKey
+_RegCloseKey.argtypes = [wintypes.HKEY]
+_RegCloseKey.restype = wintypes.LONG
+
+_PERSONALIZE_PATH = r"Software\Microsoft\Windows\CurrentVersion\Themes\Personalize"
+_HKCU = winreg.HKEY_CURRENT_USER
+_KEY_READ = winreg.KEY_READ
+_KEY_WRITE = winreg.KEY_WRITE
+_KEY_NOTIFY = winreg.KEY_NOTIFY
+_REG_DWORD = winreg.REG_DWORD
+_OpenKey = winreg.OpenKey
+_SetValueEx = winreg.SetValueEx
+_QueryValueEx = winreg.QueryValueEx
+
 stop_event: threading.Event = threading.Event()
 icon: Optional[Any] = None
+_icon_theme: Optional[str] = None
+_watcher_shutdown: Optional[int] = None
+# Guards stop_event replacement and every theme write, so a stopped worker never writes after a manual choice
+_auto_lock = threading.Lock()
+
+
+def load_icon_bytes() -> dict:
+    """Read the encoded PNG bytes of both tray icons once.
+
+    Returns:
+        Dictionary mapping theme name ('light' or 'dark') to its PNG bytes
+    """
+    icon_bytes = {}
+    try:
+        for theme in ('light', 'dark'):
+            with open(os.path.join(LIB_DIR, f"icon_{theme}.png"), 'rb') as f:
+                icon_bytes[theme] = f.read()
+    except FileNotFoundError as e:
+        logger.error("Error loading tray icons: %s", e)
+    return icon_bytes
+
+
+# Only the small encoded PNGs stay resident; pixels are decoded when an icon is shown
+_ICON_BYTES: dict = load_icon_bytes()
+
+
+def get_icon_image(theme: str) -> Optional[Any]:
+    """Decode the tray icon for a theme from its cached PNG bytes.
+
+    Args:
+        theme: Theme name ('light' or 'dark')
+
+    Returns:
+        PIL image for the icon, or None if the icon is unavailable
+    """
+    data = _ICON_BYTES.get(theme)
+    if data is None:
+        return None
+    return Image.open(io.BytesIO(data))
+
+
+def show_icon_theme(theme: str) -> None:
+    """Show the tray icon for a theme unless it is already displayed.
+
+    Args:
+        theme: Theme name ('light' or 'dark')
+    """
+    global _icon_theme
+    if not icon or theme == _icon_theme or theme not in _ICON_BYTES:
+        return
+    icon.icon = get_icon_image(theme)
+    _icon_theme = theme
+
+
+def write_theme_values(theme_value: int) -> None:
+    """Write the app and system theme values to the Personalize key.
+
+    Both values are committed in a single registry transaction so other
+    processes never see apps and system in different themes. If transactions
+    are unavailable or one cannot be created, both values are written through
+    one plain key handle.
+
+    Args:
+        theme_value: 1 for light theme, 0 for dark theme
+
+    Raises:
+        OSError: If the key cannot be opened or the values cannot be written
+    """
+    transaction = None
+    if _CreateTransaction is not None:
+        transaction = _CreateTransaction(None, None, 0, 0, 0, 0, None)
+    if transaction in (None, INVALID_HANDLE_VALUE):
+        with _OpenKey(_HKCU, _PERSONALIZE_PATH, 0, _KEY_WRITE) as key:
+            _SetValueEx(key, "AppsUseLightTheme", 0, _REG_DWORD, theme_value)
+            _SetValueEx(key, "SystemUsesLightTheme", 0, _REG_DWORD, theme_value)
+        return
+
+    try:
+        hkey = wintypes.HKEY()
+        result = _RegOpenKeyTransactedW(_HKCU, _PERSONALIZE_PATH, 0, _KEY_WRITE, ctypes.byref(hkey), transaction, None)
+        if result != 0:
+            raise ctypes.WinError(result)
+        try:
+            _SetValueEx(hkey.value, "AppsUseLightTheme", 0, _REG_DWORD, theme_value)
+            _SetValueEx(hkey.value, "SystemUsesLightTheme", 0, _REG_DWORD, theme_value)
+        finally:
+            _RegCloseKey(hkey)
+        if not _CommitTransaction(transaction):
+            raise ctypes.WinError(ctypes.get_last_error())
+    finally:
+        # Closing an uncommitted transaction rolls it back
+        _CloseHandle(transaction)
 
 
 def set_windows_theme(theme: str) -> bool:
@@ -94,30 +285,32 @@ def set_windows_theme(theme: str) -> bool:
     """
     global icon
 
+    if theme == "light":
+        theme_value = 1
+    elif theme == "dark":
+        theme_value = 0
+    else:
+        logger.error("Invalid theme: '%s'. Choose 'light' or 'dark'.", theme)
+        return False
+
     try:
-        registry_path = r"Software\Microsoft\Windows\CurrentVersion\Themes\Personalize"
-        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, registry_path, 0, winreg.KEY_WRITE) as key:
-            if theme == "light":
-                theme_value = 1
-                icon_path = "lib/icon_light.png"
-            elif theme == "dark":
-                theme_value = 0
-                icon_path = "lib/icon_dark.png"
-            else:
-                print(f"Invalid theme: '{theme}'. Choose 'light' or 'dark'.")
-                return False
-
-            winreg.SetValueEx(key, "AppsUseLightTheme", 0, winreg.REG_DWORD, theme_value)
-            winreg.SetValueEx(key, "SystemUsesLightTheme", 0, winreg.REG_DWORD, theme_value)
-
-            if icon:
-                icon.icon = Image.open(icon_path)
-
-        ctypes.windll.user32.SendMessageW(0xFFFF, 0x001A, 0, 0)
-        print(f"Theme successfully changed to '{theme}'.")
+        # Skip the registry writes and the system-wide broadcast if nothing changes
+        if theme_values_match(theme_value):
+            show_icon_theme(theme)
+            logger.debug("Theme is already '%s'.", theme)
+            return True
+
+        write_theme_values(theme_value)
+        show_icon_theme(theme)
+
+        # A hung window must not block the automatic mode thread
+        result = ctypes.c_size_t()
+        _SendMessageTimeoutW(HWND_BROADCAST, WM_SETTINGCHANGE, 0, "ImmersiveColorSet",
+                             SMTO_ABORTIFHUNG, BROADCAST_TIMEOUT, ctypes.byref(result))
+        logger.info("Theme successfully changed to '%s'.", theme)
         return True
     except Exception as e:
-        print(f"Error setting theme: {e}")
+        logger.error("Error setting theme: %s", e)
         return False
 
 
@@ -128,25 +321,40 @@ def get_system_language() -> str:
         Two-letter language code (e.g., 'en', 'ru', 'es')
     """
     try:
-        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
-        GetUserDefaultUILanguage = kernel32.GetUserDefaultUILanguage
-        GetUserDefaultUILanguage.restype = ctypes.c_uint
-        lcid = GetUserDefaultUILanguage()
+        lcid = _GetUserDefaultUILanguage()
 
         LOCALE_NAME_MAX_LENGTH = 85
         LOCALE_SISO639LANGNAME = 0x59
 
         locale_name = ctypes.create_unicode_buffer(LOCALE_NAME_MAX_LENGTH)
 
-        if kernel32.GetLocaleInfoW(lcid, LOCALE_SISO639LANGNAME, locale_name, LOCALE_NAME_MAX_LENGTH):
+        if _GetLocaleInfoW(lcid, LOCALE_SISO639LANGNAME, locale_name, LOCALE_NAME_MAX_LENGTH):
             return locale_name.value[:2].lower()
 
         return 'en'
     except Exception as e:
-        print(f"Error detecting system language: {e}")
+        logger.error("Error detecting system language: %s", e)
         return 'en'
 
 
+def theme_values_match(theme_value: int) -> bool:
+    """Check whether both app and system theme values already equal theme_value.
+
+    Args:
+        theme_value: 1 for light theme, 0 for dark theme
+
+    Returns:
+        True if both registry values match, False otherwise or on error
+    """
+    try:
+        with _OpenKey(_HKCU, _PERSONALIZE_PATH, 0, _KEY_READ) as key:
+            return (_QueryValueEx(key, "AppsUseLightTheme")[0] == theme_value
+                    and _QueryValueEx(key, "SystemUsesLightTheme")[0] == theme_value)
+    except Exception as e:
+        logger.error("Error reading current theme values: %s", e)
+        return False
+
+
 def get_current_theme() -> Optional[int]:
     """Get current Windows theme setting.
 
@@ -154,31 +362,129 @@ def get_current_theme() -> Optional[int]:
         1 if light theme is active, 0 if dark theme is active, None on error
     """
     try:
-        registry_path = r"Software\Microsoft\Windows\CurrentVersion\Themes\Personalize"
-        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, registry_path, 0, winreg.KEY_READ) as key:
-            return winreg.QueryValueEx(key, "AppsUseLightTheme")[0]
+        with _OpenKey(_HKCU, _PERSONALIZE_PATH, 0, _KEY_READ) as key:
+            return _QueryValueEx(key, "AppsUseLightTheme")[0]
     except Exception as e:
-        print(f"Error getting current theme: {e}")
+        logger.error("Error getting current theme: %s", e)
         return None
 
 
+def _load_cached_location() -> Optional[Tuple[float, float, float]]:
+    """Read the cached location from disk.
+
+    Returns:
+        Tuple of (latitude, longitude, timestamp) or None if no usable cache exists
+    """
+    try:
+        with open(LOCATION_CACHE_PATH, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return float(data['lat']), float(data['lon']), float(data['ts'])
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.error("Error reading cached location: %s", e)
+        return None
+
+
+def _save_cached_location(latitude: float, longitude: float) -> None:
+    """Atomically write the location to the on-disk cache.
+
+    Args:
+        latitude: Geographic latitude
+        longitude: Geographic longitude
+    """
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = LOCATION_CACHE_PATH + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'lat': latitude, 'lon': longitude, 'ts': time.time()}, f)
+        os.replace(tmp_path, LOCATION_CACHE_PATH)
+    except Exception as e:
+        logger.error("Error saving cached location: %s", e)
+
+
 def get_location() -> Tuple[Optional[float], Optional[float]]:
     """Get current geographic location using IP geolocation.
 
+    A cached location younger than LOCATION_CACHE_TTL is returned without
+    any network access. If the lookup fails, a stale cached value is used.
+
     Returns:
         Tuple of (latitude, longitude) or (None, None) on error
     """
+    cached = _load_cached_location()
+    if cached is not None and time.time() - cached[2] < LOCATION_CACHE_TTL:
+        return cached[0], cached[1]
+
+    # Imported here: urllib.request pulls in ssl and http.client, and a fresh cache never needs them
+    import urllib.request
+
     try:
-        response = requests.get('https://ipinfo.io/json', timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        with urllib.request.urlopen('https://ipinfo.io/json', timeout=10) as response:
+            data = json.load(response)
         latitude, longitude = map(float, data['loc'].split(','))
+        _save_cached_location(latitude, longitude)
         return latitude, longitude
     except Exception as e:
-        print(f"Error getting location: {e}")
+        logger.error("Error getting location: %s", e)
+        if cached is not None:
+            logger.warning("Using stale cached location")
+            return cached[0], cached[1]
         return None, None
 
 
+def _sunrise_sunset_noaa(lat: float, lon: float, date_utc: str) -> Tuple[datetime, datetime]:
+    """Calculate sunrise and sunset with the closed-form NOAA solar equations.
+
+    Accurate to about a minute, which is well within what a theme switch needs.
+
+    Args:
+        lat: Geographic latitude in degrees
+        lon: Geographic longitude in degrees (east positive)
+        date_utc: UTC date formatted as 'YYYY-MM-DD'
+
+    Returns:
+        Tuple of (sunrise_time_utc, sunset_time_utc)
+
+    Raises:
+        ValueError: If the sun does not rise or set on that date (polar day/night)
+    """
+    day = date.fromisoformat(date_utc)
+    gamma = 2 * math.pi / 365 * (day.timetuple().tm_yday - 1)
+    eqtime = 229.18 * (0.000075 + 0.001868 * math.cos(gamma) - 0.032077 * math.sin(gamma)
+                       - 0.014615 * math.cos(2 * gamma) - 0.040849 * math.sin(2 * gamma))
+    decl = (0.006918 - 0.399912 * math.cos(gamma) + 0.070257 * math.sin(gamma)
+            - 0.006758 * math.cos(2 * gamma) + 0.000907 * math.sin(2 * gamma)
+            - 0.002697 * math.cos(3 * gamma) + 0.00148 * math.sin(3 * gamma))
+
+    phi = math.radians(lat)
+    cos_hour_angle = (math.cos(math.radians(90.833)) / (math.cos(phi) * math.cos(decl))
+                      - math.tan(phi) * math.tan(decl))
+    if not -1.0 <= cos_hour_angle <= 1.0:
+        raise ValueError(f"No sunrise/sunset on {date_utc} at latitude {lat}")
+    hour_angle = math.degrees(math.acos(cos_hour_angle))
+
+    midnight_utc = datetime(day.year, day.month, day.day)
+    sunrise_time_utc = midnight_utc + timedelta(minutes=720 - 4 * (lon + hour_angle) - eqtime)
+    sunset_time_utc = midnight_utc + timedelta(minutes=720 - 4 * (lon - hour_angle) - eqtime)
+    return sunrise_time_utc, sunset_time_utc
+
+
+@lru_cache(maxsize=SUN_TIMES_CACHE_SIZE)
+def _sun_times_cached(date_utc: str, lat_r: float, lon_r: float) -> Tuple[datetime, datetime]:
+    """Calculate sunrise and sunset for a UTC date and rounded coordinates.
+
+    Args:
+        date_utc: UTC date formatted as 'YYYY-MM-DD'
+        lat_r: Latitude rounded to 2 decimals
+        lon_r: Longitude rounded to 2 decimals
+
+    Returns:
+        Tuple of (sunrise_time_utc, sunset_time_utc)
+    """
+    return _sunrise_sunset_noaa(lat_r, lon_r, date_utc)
+
+
 def get_sunrise_and_sunset(latitude: float, longitude: float) -> Tuple[Optional[datetime], Optional[datetime]]:
     """Calculate sunrise and sunset times for given coordinates.
 
@@ -190,14 +496,10 @@ def get_sunrise_and_sunset(latitude: float, longitude: float) -> Tuple[Optional[
         Tuple of (sunrise_time_utc, sunset_time_utc) or (None, None) on error
     """
     try:
-        observer = ephem.Observer()
-        observer.lat = str(latitude)
-        observer.lon = str(longitude)
-        sunrise_time_utc = observer.next_rising(ephem.Sun()).datetime()
-        sunset_time_utc = observer.next_setting(ephem.Sun()).datetime()
-        return sunrise_time_utc, sunset_time_utc
+        date_utc = datetime.now(timezone.utc).date().isoformat()
+        return _sun_times_cached(date_utc, round(latitude, 2), round(longitude, 2))
     except Exception as e:
-        print(f"Error calculating sunrise/sunset: {e}")
+        logger.error("Error calculating sunrise/sunset: %s", e)
         return None, None
 
 
@@ -212,14 +514,12 @@ def sun_time_local(sunrise_datetime_utc: datetime, sunset_datetime_utc: datetime
         Tuple of (sunrise_local, sunset_local) formatted as 'HH:MM:SS', or None on error
     """
     try:
-        local_offset = datetime.now(timezone.utc).astimezone().utcoffset()
-        if local_offset is None:
-            return None
-        sunrise_time_local = sunrise_datetime_utc + local_offset
-        sunset_time_local = sunset_datetime_utc + local_offset
+        # Each instant is converted with the offset in effect at that moment, so DST days are handled
+        sunrise_time_local = sunrise_datetime_utc.replace(tzinfo=timezone.utc).astimezone()
+        sunset_time_local = sunset_datetime_utc.replace(tzinfo=timezone.utc).astimezone()
         return sunrise_time_local.strftime('%H:%M:%S'), sunset_time_local.strftime('%H:%M:%S')
     except Exception as e:
-        print(f"Error converting to local time: {e}")
+        logger.error("Error converting to local time: %s", e)
         return None
 
 
@@ -240,123 +540,272 @@ def automatic_data() -> Optional[Tuple[str, str]]:
     return sun_time_local(sunrise_datetime_utc, sunset_datetime_utc)
 
 
-def get_local_time() -> str:
-    """Get current local time formatted as 'HH:MM:SS'.
+def _hms_to_sec(hms: str) -> int:
+    """Convert a 'HH:MM:SS' string to seconds since midnight.
+
+    Args:
+        hms: Time formatted as 'HH:MM:SS'
 
     Returns:
-        Current local time string
+        Number of seconds since midnight
     """
-    return datetime.now().strftime("%H:%M:%S")
+    hours, minutes, seconds = map(int, hms.split(':'))
+    return hours * 3600 + minutes * 60 + seconds
 
 
-def select_theme(theme: str) -> None:
+def get_local_seconds() -> int:
+    """Get current local time as seconds since midnight.
+
+    Returns:
+        Number of seconds since local midnight
+    """
+    now = datetime.now()
+    return now.hour * 3600 + now.minute * 60 + now.second
+
+
+def seconds_until_next_transition(sunrise_sec: int, sunset_sec: int, now_sec: int) -> int:
+    """Get the number of seconds until the next sunrise, sunset or midnight.
+
+    Args:
+        sunrise_sec: Local sunrise time in seconds since midnight
+        sunset_sec: Local sunset time in seconds since midnight
+        now_sec: Current local time in seconds since midnight
+
+    Returns:
+        Seconds to wait before the theme may need to change, capped at MAX_WAIT
+    """
+    deltas = (sunrise_sec - now_sec, sunset_sec - now_sec, 86400 - now_sec)
+    delay = min(delta for delta in deltas if delta >= 0)
+    # Wake just past the boundary so the strict comparison sees the new state
+    return min(delay + 1, MAX_WAIT)
+
+
+def select_theme(theme: str, *_: Any) -> None:
     """Select and apply a theme, starting automatic mode if requested.
 
     Args:
         theme: Theme to apply ('auto', 'light', or 'dark')
+        *_: Icon and menu item passed by pystray when used as a menu action
     """
-    stop_event.set()
     if theme == 'auto':
         start_automatic()
-    else:
-        print("Automatic mode disabled")
+        return
+
+    with _auto_lock:
+        stop_event.set()
+        logger.info("Automatic mode disabled")
         set_windows_theme(theme)
 
 
 def start_automatic() -> None:
-    """Start automatic theme switching in a background thread."""
-    print("Automatic mode enabled")
+    """Start automatic theme switching in a background thread.
+
+    Any previous automatic worker is signalled to stop first. It exits on its
+    own event without being joined, so the tray menu thread never blocks.
+    """
+    logger.info("Automatic mode enabled")
     global stop_event
-    stop_event = threading.Event()
-    thread = threading.Thread(target=automatic_theme, daemon=True)
-    thread.start()
+    with _auto_lock:
+        stop_event.set()
+        stop_event = threading.Event()
+        thread = threading.Thread(target=automatic_theme, args=(stop_event,), daemon=True)
+        thread.start()
 
 
-def automatic_theme() -> None:
-    """Monitor time and automatically switch theme based on sunrise/sunset."""
+def automatic_theme(stop: threading.Event) -> None:
+    """Monitor time and automatically switch theme based on sunrise/sunset.
+
+    Args:
+        stop: Event owned by this worker; setting it ends automatic mode
+    """
     backoff = 30  # initial backoff in seconds
     max_backoff = 600  # maximum backoff in seconds (10 minutes)
     max_retries = 10  # maximum number of retry attempts
     retry_count = 0
     sun_times = automatic_data()
-    
-    while sun_times is None and not stop_event.is_set() and retry_count < max_retries:
-        print(f"Failed to get data for automatic mode. Retrying in {backoff} seconds... (attempt {retry_count + 1}/{max_retries})")
-        stop_event.wait(backoff)  # Use wait instead of sleep for responsive stop handling
-        if stop_event.is_set():
+
+    while sun_times is None and not stop.is_set() and retry_count < max_retries:
+        logger.warning("Failed to get data for automatic mode. Retrying in %d seconds... (attempt %d/%d)",
+                       backoff, retry_count + 1, max_retries)
+        stop.wait(backoff)  # Use wait instead of sleep for responsive stop handling
+        if stop.is_set():
             break
         backoff = min(backoff * 2, max_backoff)
         sun_times = automatic_data()
         retry_count += 1
-    
+
     if sun_times is None:
-        print("Could not fetch sunrise/sunset data after multiple attempts. Exiting automatic mode.")
+        logger.error("Could not fetch sunrise/sunset data after multiple attempts. Exiting automatic mode.")
         return
 
     sunrise, sunset = sun_times
+    sunrise_sec, sunset_sec = _hms_to_sec(sunrise), _hms_to_sec(sunset)
+    sun_times_date = date.today()
     current_applied_theme = None
 
-    while not stop_event.is_set():
-        local_time = get_local_time()
-        print(f"Sunrise: {sunrise} | Current: {local_time} | Sunset: {sunset}")
+    while not stop.is_set():
+        if date.today() != sun_times_date:
+            refreshed = automatic_data()
+            if refreshed is not None:
+                sunrise, sunset = refreshed
+                sunrise_sec, sunset_sec = _hms_to_sec(sunrise), _hms_to_sec(sunset)
+                sun_times_date = date.today()
+            # A manual theme may have been chosen while the refresh was running
+            if stop.is_set():
+                return
+
+        now_sec = get_local_seconds()
+        logger.debug("Sunrise: %s | Current: %02d:%02d:%02d | Sunset: %s",
+                     sunrise, now_sec // 3600, now_sec // 60 % 60, now_sec % 60, sunset)
+
+        desired_theme = "light" if sunrise_sec < now_sec < sunset_sec else "dark"
 
-        desired_theme = "light" if sunrise < local_time < sunset else "dark"
-        
         # Only set theme if it needs to change
         if desired_theme != current_applied_theme:
-            if set_windows_theme(desired_theme):
-                current_applied_theme = desired_theme
+            with _auto_lock:
+                # Re-check under the lock so a manual choice made meanwhile is never overwritten
+                if stop.is_set():
+                    return
+                if set_windows_theme(desired_theme):
+                    current_applied_theme = desired_theme
 
-        stop_event.wait(60)  # Use wait instead of sleep for responsive stop handling
+        # Sleep until the next transition; wait returns True as soon as the mode is switched
+        if stop.wait(seconds_until_next_transition(sunrise_sec, sunset_sec, now_sec)):
+            return
 
 
-def get_translations(language: str) -> dict:
+def get_translations(language: str) -> Mapping[str, str]:
     """Get translations for a specific language, with fallback to English.
 
     Args:
         language: Two-letter language code
 
     Returns:
-        Dictionary of translations
+        Read-only mapping of translations
     """
     return TRANSLATIONS.get(language, TRANSLATIONS['en'])
 
 
+def watch_theme_changes() -> None:
+    """Keep the tray icon in sync with theme changes made outside the app.
+
+    Waits on RegNotifyChangeKeyValue for the Personalize key instead of
+    polling, and exits as soon as the shutdown event is signalled.
+    """
+    if not _watcher_shutdown:
+        logger.error("Error creating theme watcher shutdown event")
+        return
+
+    change_event = _CreateEventW(None, False, False, None)
+    if not change_event:
+        logger.error("Error creating theme watcher change event")
+        return
+
+    handles = (wintypes.HANDLE * 2)(change_event, _watcher_shutdown)
+    try:
+        with _OpenKey(_HKCU, _PERSONALIZE_PATH, 0, _KEY_NOTIFY) as key:
+            while True:
+                # The notification is one-shot, so it has to be re-armed after every change
+                result = _RegNotifyChangeKeyValue(key.handle, False, REG_NOTIFY_CHANGE_LAST_SET, change_event, True)
+                if result != 0:
+                    logger.error("Error watching theme changes: %s", ctypes.WinError(result))
+                    return
+
+                if _WaitForMultipleObjects(2, handles, False, INFINITE) != WAIT_OBJECT_0:
+                    return
+
+                current_theme = get_current_theme()
+                if current_theme is not None:
+                    show_icon_theme('light' if current_theme else 'dark')
+    except Exception as e:
+        logger.error("Error watching theme changes: %s", e)
+    finally:
+        _CloseHandle(change_event)
+
+
+def start_theme_watcher() -> None:
+    """Start watching the registry for external theme changes in a background thread."""
+    global _watcher_shutdown
+    _watcher_shutdown = _CreateEventW(None, True, False, None)
+    thread = threading.Thread(target=watch_theme_changes, daemon=True)
+    thread.start()
+
+
+def on_tray_ready(tray_icon: Any) -> None:
+    """Show the tray icon, then start background work once the icon loop is running.
+
+    If the icon cannot be shown, the app stops instead of switching themes
+    with no tray menu to control it.
+
+    Args:
+        tray_icon: Icon passed by pystray to its setup callback
+    """
+    try:
+        tray_icon.visible = True
+    except Exception as e:
+        logger.error("Error showing tray icon: %s", e)
+        tray_icon.stop()
+        return
+
+    start_theme_watcher()
+    start_automatic()
+
+
 def create_tray_icon() -> None:
     """Create and run the system tray icon with localized menu."""
-    global icon
+    global icon, _icon_theme
 
     current_theme = get_current_theme()
     if current_theme is None:
         return
 
-    icon_path = f"lib/icon_{'light' if current_theme else 'dark'}.png"
-    icon = pystray.Icon("dynamics_theme", Image.open(icon_path), APP_NAME)
+    theme = 'light' if current_theme else 'dark'
+    image = get_icon_image(theme)
+    if image is None:
+        logger.error("Tray icon images are missing from %s", LIB_DIR)
+        return
+
+    icon = pystray.Icon("dynamics_theme", image, APP_NAME)
+    _icon_theme = theme
 
     language = get_system_language()
     translations = get_translations(language)
 
     menu_items = [
-        pystray.MenuItem(translations['dark'], lambda: select_theme('dark')),
-        pystray.MenuItem(translations['light'], lambda: select_theme('light')),
-        pystray.MenuItem(translations['automatic'], lambda: select_theme('auto')),
+        pystray.MenuItem(translations['dark'], partial(select_theme, 'dark')),
+        pystray.MenuItem(translations['light'], partial(select_theme, 'light')),
+        pystray.MenuItem(translations['automatic'], partial(select_theme, 'auto')),
         pystray.MenuItem(translations['exit'], hide_icon)
     ]
 
     icon.menu = pystray.Menu(*menu_items)
-    start_automatic()
-    icon.run()
+    icon.run(setup=on_tray_ready)
 
 
 def hide_icon() -> None:
     """Stop the tray icon and exit the application."""
     global icon
     stop_event.set()
+    if _watcher_shutdown:
+        _SetEvent(_watcher_shutdown)
     if icon:
         icon.stop()
     sys.exit(0)
 
 
+def configure_logging() -> None:
+    """Write log messages to the file named by LOG_ENV_VAR, if it is set."""
+    log_path = os.environ.get(LOG_ENV_VAR)
+    if log_path:
+        logging.basicConfig(
+            filename=log_path,
+            level=logging.INFO,
+            format='%(asctime)s %(levelname)s %(threadName)s: %(message)s',
+            encoding='utf-8',
+        )
+
+
 if __name__ == "__main__":
+    configure_logging()
     create_tray_icon()
 